@@ -21,7 +21,7 @@ def main(argv=None):
     except KeyboardInterrupt:
         logging.info("Shutting down...")
     finally:
-        for sock in [node.udp_socket, node.cli_socket] + node.cli_clients:
+        for sock in [node.udp_socket, node.cli_socket] + [conn.sock for conn in node.cli_clients.values()]:
             try:
                 sock.close()
             except Exception:
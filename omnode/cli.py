@@ -1,58 +1,87 @@
+import socket
 import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+
+@dataclass
+class CliConn:
+    """A connected CLI client and its partially received input."""
+
+    sock: socket.socket
+    addr: Tuple[str, int]
+    buffer: bytearray = field(default_factory=bytearray)
 
 
 class CliHandler:
     def __init__(self, node: "PeerNode"):
         self.node = node
+        self._commands: Dict[str, Callable[[socket.socket, List[str]], None]] = {
+            "peers": self._cmd_peers,
+            "current": self._cmd_current,
+            "consensus": self._cmd_consensus,
+            "lie": self._cmd_lie,
+            "truth": self._cmd_truth,
+            "exit": self._cmd_exit,
+        }
 
     def handle_cli_message(self, client, line: str):
         parts = line.strip().split()
         if not parts:
             return
-        cmd = parts[0].lower()
-        if cmd == "peers":
-            resp_lines = []
-            for info in self.node.peers.values():
-                delta = time.time() - info.get("last_seen", 0)
-                resp_lines.append(
-                    f"{info['host']}:{info['port']} (name={info.get('name','')}, last_seen={delta:.1f}s)"
-                )
-            if not resp_lines:
-                resp_lines = ["No peers known."]
-            client.sendall(("\n".join(resp_lines) + "\n").encode())
-        elif cmd == "current":
-            words = ", ".join(f"[{i}] {w}" for i, w in enumerate(self.node.word_list))
-            client.sendall((words + "\n").encode())
-        elif cmd == "consensus" and len(parts) >= 3:
+        handler = self._commands.get(parts[0].lower())
+        if handler is None:
+            client.sendall(b"Unknown command.\n")
+            return
+        handler(client, parts[1:])
+
+    # Commands -------------------------------------------------------
+    def _cmd_peers(self, client, args: List[str]):
+        resp_lines = []
+        for info in self.node.peers.values():
+            delta = time.monotonic() - info.get("last_seen", 0)
+            resp_lines.append(
+                f"{info['host']}:{info['port']} (name={info.get('name','')}, last_seen={delta:.1f}s)"
+            )
+        if not resp_lines:
+            resp_lines = ["No peers known."]
+        client.sendall(("\n".join(resp_lines) + "\n").encode())
+
+    def _cmd_current(self, client, args: List[str]):
+        words = ", ".join(f"[{i}] {w}" for i, w in enumerate(self.node.word_list))
+        client.sendall((words + "\n").encode())
+
+    def _cmd_consensus(self, client, args: List[str]):
+        if len(args) < 2:
+            client.sendall(b"Unknown command.\n")
+            return
+        try:
+            idx = int(args[0])
+        except ValueError:
+            client.sendall(b"Invalid index.\n")
+            return
+        value = " ".join(args[1:])
+        self.node.consensus.start_root_consensus(idx, value)
+        client.sendall(b"Consensus started.\n")
+
+    def _cmd_lie(self, client, args: List[str]):
+        rate = 1.0
+        if args:
             try:
-                idx = int(parts[1])
+                rate = max(0.0, min(1.0, float(args[0]) / 100.0))
             except ValueError:
-                client.sendall(b"Invalid index.\n")
-                return
-            value = " ".join(parts[2:])
-            self.node.consensus.start_root_consensus(idx, value)
-            client.sendall(b"Consensus started.\n")
-        elif cmd == "lie":
-            rate = 1.0
-            if len(parts) > 1:
-                try:
-                    rate = max(0.0, min(1.0, float(parts[1]) / 100.0))
-                except ValueError:
-                    pass
-            self.node.lie_mode = True
-            self.node.lie_rate = rate
-            client.sendall(f"Lying enabled at rate {self.node.lie_rate*100:.0f}%.\n".encode())
-        elif cmd == "truth":
-            self.node.lie_mode = False
-            client.sendall(b"Lying disabled.\n")
-        elif cmd == "exit":
-            client.sendall(b"Goodbye.\n")
-            client.close()
-            if client in self.node.cli_clients:
-                self.node.cli_clients.remove(client)
-            self.node.cli_buffers.pop(client, None)
-        else:
-            client.sendall(b"Unknown command.\n")
+                pass
+        self.node.lie_mode = True
+        self.node.lie_rate = rate
+        client.sendall(f"Lying enabled at rate {self.node.lie_rate*100:.0f}%.\n".encode())
+
+    def _cmd_truth(self, client, args: List[str]):
+        self.node.lie_mode = False
+        client.sendall(b"Lying disabled.\n")
+
+    def _cmd_exit(self, client, args: List[str]):
+        client.sendall(b"Goodbye.\n")
+        self.node.close_cli_client(client)
 
 
 from typing import TYPE_CHECKING
@@ -1,18 +1,28 @@
-import json
 import logging
 import math
 import random
-import uuid
-from typing import Dict, List, Tuple
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Tuple
 
+from . import wire
 from .consensus_state import ConsensusState
-from .utils import peer_key, resolve_host
+from .mmsg import send_batch
+from .utils import new_message_id, peer_key, resolve_host
+
+# Upper bound on queued consensus reports applied per main-loop iteration.
+REPORTS_PER_TICK = 256
+# Reports arriving while this many are queued are dropped, so a CONSENSUS flood
+# cannot grow the backlog (and the latency behind it) without limit.
+MAX_PENDING_REPORTS = 16 * REPORTS_PER_TICK
 
 
 class ConsensusEngine:
     def __init__(self, node: "PeerNode"):
         self.node = node
         self.consensus_map: Dict[str, ConsensusState] = {}
+        self.pending_reports: Deque[Tuple[str, str, str]] = deque()
+        self.dropped_reports = 0
 
     # Value selection -------------------------------------------------
     def choose_value(self, honest_value: str) -> str:
@@ -22,6 +32,20 @@ class ConsensusEngine:
             return "faulty_attack"
         return honest_value
 
+    def send_to_peers(self, msg: dict, addresses: List[Tuple[str, int]], honest_value: str):
+        # Only "value" differs between peers, so encode once per distinct value.
+        payloads: Dict[str, bytes] = {}
+        outgoing = []
+        for host, port in addresses:
+            peer_value = self.choose_value(honest_value)
+            payload = payloads.get(peer_value)
+            if payload is None:
+                peer_msg = dict(msg)
+                peer_msg["value"] = peer_value
+                payload = payloads[peer_value] = wire.encode(peer_msg)
+            outgoing.append((payload, (resolve_host(host), port)))
+        send_batch(self.node.udp_socket, outgoing)
+
     # Consensus state helpers ----------------------------------------
     def get_consensus(self, msg: dict) -> ConsensusState:
         cid = msg.get("id")
@@ -30,28 +54,47 @@ class ConsensusEngine:
         return self.consensus_map[cid]
 
     def propagate_result_upwards(self, cid: str, reporter: str, value: str):
+        # Queued rather than applied inline; the main loop drains it between selects.
+        if len(self.pending_reports) >= MAX_PENDING_REPORTS:
+            self.dropped_reports += 1
+            return
+        self.pending_reports.append((cid, reporter, value))
+
+    def process_pending_reports(self, limit: int = REPORTS_PER_TICK):
+        if self.dropped_reports:
+            logging.warning("Consensus report queue full; dropped %d reports.", self.dropped_reports)
+            self.dropped_reports = 0
+        for _ in range(min(limit, len(self.pending_reports))):
+            cid, reporter, value = self.pending_reports.popleft()
+            try:
+                self._apply_report(cid, reporter, value)
+            except Exception:
+                traceback.print_exc()
+
+    def _apply_report(self, cid: str, reporter: str, value: str):
         consensus = self.consensus_map.get(cid)
         if not consensus:
             return
         consensus.record_report(reporter, value)
-        if consensus.is_complete():
-            result = consensus.decide()
-            if result is None:
+        if not consensus.is_complete():
+            return
+        result = consensus.decide()
+        if result is None:
+            return
+        if consensus.parentid:
+            if not isinstance(consensus.parentid, str):
+                # Malformed parent link from a peer; it can never match a consensus id.
                 return
-            if consensus.parentid:
-                parent_reporter = consensus.reporter or reporter or consensus.initiator
-                parent = self.consensus_map.get(consensus.parentid)
-                if parent:
-                    self.propagate_result_upwards(consensus.parentid, parent_reporter, result)
-            else:
-                if 0 <= consensus.index < len(self.node.word_list):
-                    self.node.word_list[consensus.index] = result
-                    logging.info(
-                        "Consensus %s complete. Index %d set to '%s'",
-                        cid,
-                        consensus.index,
-                        result,
-                    )
+            parent_reporter = consensus.reporter or reporter or consensus.initiator
+            self.pending_reports.append((consensus.parentid, parent_reporter, result))
+        elif 0 <= consensus.index < len(self.node.word_list):
+            self.node.word_list[consensus.index] = result
+            logging.info(
+                "Consensus %s complete. Index %d set to '%s'",
+                cid,
+                consensus.index,
+                result,
+            )
 
     def launch_subconsensus(self, parent_msg: dict, sender_key: str, received_value: str):
         parent = self.get_consensus(parent_msg)
@@ -61,7 +104,7 @@ class ConsensusEngine:
         peers = [p for p in parent.peers if p != sender_key]
         if not peers:
             return
-        new_id = str(uuid.uuid4())
+        new_id = new_message_id()
         self_value = self.choose_value(received_value)
         sub_msg = {
             "command": "CONSENSUS",
@@ -75,16 +118,9 @@ class ConsensusEngine:
             "reporter": sender_key,
             "default_value": parent.default_value,
         }
-        self.consensus_map[new_id] = ConsensusState(sub_msg)
-        for peer in peers:
-            host, port = peer.split(":")
-            peer_value = self.choose_value(received_value)
-            peer_msg = dict(sub_msg)
-            peer_msg["value"] = peer_value
-            try:
-                self.node.udp_socket.sendto(json.dumps(peer_msg).encode(), (resolve_host(host), int(port)))
-            except OSError:
-                continue
+        sub_state = ConsensusState(sub_msg)
+        self.consensus_map[new_id] = sub_state
+        self.send_to_peers(sub_msg, list(sub_state.addresses.values()), received_value)
         self.propagate_result_upwards(parent.id, peer_key(self.node.peer_host, self.node.peer_port), self_value)
 
     def handle_consensus(self, msg: dict, addr: Tuple[str, int]):
@@ -105,7 +141,7 @@ class ConsensusEngine:
             logging.info("No peers available for consensus.")
             return
         m = math.floor((peer_count - 1) / 3)
-        cid = str(uuid.uuid4())
+        cid = new_message_id()
         self_value = self.choose_value(value)
         msg = {
             "command": "CONSENSUS",
@@ -124,17 +160,7 @@ class ConsensusEngine:
             self.node.word_list[index] = self_value
         self_key = peer_key(self.node.peer_host, self.node.peer_port)
         state.record_report(self_key, self_value)
-        for peer in peers:
-            if peer == self_key:
-                continue
-            host, port = peer.split(":")
-            peer_value = self.choose_value(value)
-            peer_msg = dict(msg)
-            peer_msg["value"] = peer_value
-            try:
-                self.node.udp_socket.sendto(json.dumps(peer_msg).encode(), (resolve_host(host), int(port)))
-            except OSError:
-                continue
+        self.send_to_peers(msg, [addr for key, addr in state.addresses.items() if key != self_key], value)
         logging.info(
             "Started consensus %s at index %d with value '%s' and m=%d",
             cid,
@@ -1,43 +1,55 @@
-import uuid
 from collections import Counter
-from typing import Dict, List, Optional, Set
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .utils import new_message_id, parse_peer_key
 
 
 class ConsensusState:
     def __init__(self, msg: dict):
-        self.id: str = msg.get("id", str(uuid.uuid4()))
+        self.id: str = msg["id"] if "id" in msg else new_message_id()
         self.omlevel: int = int(msg.get("omlevel", 0))
         self.initiator: str = msg.get("initiator", "")
         self.peers: List[str] = msg.get("peers", [])
+        # Parsed once so send loops need not split "host:port" per message.
+        self.addresses: Dict[str, Tuple[str, int]] = {}
+        for key in self.peers:
+            addr = parse_peer_key(key)
+            if addr is not None:
+                self.addresses[key] = addr
         self.index: int = int(msg.get("index", 0))
         self.value: str = msg.get("value", "")
         self.default_value: str = msg.get("default_value", self.value)
         self.parentid: Optional[str] = msg.get("parentid")
         self.reporter: Optional[str] = msg.get("reporter")
         self.reports: Dict[str, str] = {}
+        self._counts: Counter = Counter()
         self.resolved: Optional[str] = None
         self.subconsensus_launched: Set[str] = set()
+        self._expected: FrozenSet[str] = frozenset(self.peers)
+        self._missing: Set[str] = set(self._expected)
 
-    def expected_participants(self) -> Set[str]:
-        return set(self.peers)
+    def expected_participants(self) -> FrozenSet[str]:
+        return self._expected
 
     def record_report(self, reporter: str, value: str):
+        self._missing.discard(reporter)
+        if reporter in self.reports:
+            self._counts[self.reports[reporter]] -= 1
+        self._counts[value] += 1
         self.reports[reporter] = value
 
     def is_complete(self) -> bool:
-        expected = self.expected_participants()
-        return expected.issubset(set(self.reports.keys()))
+        return not self._missing
 
     def decide(self) -> Optional[str]:
         if self.resolved is not None:
             return self.resolved
         if not self.reports:
             return None
-        counts = Counter(self.reports.values())
-        best_count = max(counts.values())
-        winners = [v for v, c in counts.items() if c == best_count]
+        best_count = max(self._counts.values())
+        winners = [v for v, c in self._counts.items() if c == best_count]
         if self.default_value in winners:
             self.resolved = self.default_value
         else:
-            self.resolved = sorted(winners)[0]
+            self.resolved = min(winners)
         return self.resolved
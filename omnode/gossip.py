@@ -1,50 +1,60 @@
-import json
 import random
 import time
-import uuid
 from typing import List, Optional, Tuple
 
-from .utils import peer_key, resolve_host
+from . import wire
+from .mmsg import send_batch
+from .utils import new_message_id, peer_key
+
+GOSSIP_CACHE_TTL = 300
+# Bounds memory during a gossip storm; the oldest ids are dropped first.
+GOSSIP_CACHE_MAX = 5000
 
 
 class GossipEngine:
     def __init__(self, node: "PeerNode"):
         self.node = node
+        self._gossip_prefix, self._gossip_suffix = self._build_template("GOSSIP")
+        self._reply_prefix, self._reply_suffix = self._build_template("GOSSIP_REPLY")
+
+    def _build_template(self, command: str) -> Tuple[bytes, bytes]:
+        """Pre-encode a message of our own with every field but ``id``, which goes last."""
+        static = wire.encode(
+            {
+                "command": command,
+                "host": self.node.peer_host,
+                "port": self.node.peer_port,
+                "name": self.node.peer_name,
+                "cliPort": self.node.cli_port,
+            }
+        )
+        return static[:-1] + b',"id":"', b'"}'
 
     def mark_gossip_seen(self, gid: str) -> bool:
-        now = time.time()
-        self.node.gossip_cache = {k: v for k, v in self.node.gossip_cache.items() if now - v < 300}
-        if gid in self.node.gossip_cache:
+        now = time.monotonic()
+        cache = self.node.gossip_cache
+        while cache and now - next(iter(cache.values())) >= GOSSIP_CACHE_TTL:
+            cache.popitem(last=False)
+        if gid in cache:
             return True
-        self.node.gossip_cache[gid] = now
+        cache[gid] = now
+        if len(cache) > GOSSIP_CACHE_MAX:
+            cache.popitem(last=False)
         return False
 
     def send_gossip(self, targets: List[Tuple[str, int]]):
-        gid = str(uuid.uuid4())
-        message = {
-            "command": "GOSSIP",
-            "host": self.node.peer_host,
-            "port": self.node.peer_port,
-            "name": self.node.peer_name,
-            "id": gid,
-            "cliPort": self.node.cli_port,
-        }
-        payload = json.dumps(message).encode()
-        for host, port in targets:
-            try:
-                self.node.udp_socket.sendto(payload, (resolve_host(host), port))
-            except OSError:
-                continue
+        """Send our own GOSSIP to already-resolved (ip, port) targets."""
+        # Message ids are hex, so they can be spliced in without JSON escaping.
+        payload = self._gossip_prefix + new_message_id().encode() + self._gossip_suffix
+        send_batch(self.node.udp_socket, [(payload, addr) for addr in targets])
 
     def forward_gossip(self, msg: dict, exclude: Tuple[str, int]):
-        peers = self.node.known_peers()
-        random.shuffle(peers)
-        peers = [p for p in peers if p != exclude]
-        for host, port in peers[:5]:
-            try:
-                self.node.udp_socket.sendto(json.dumps(msg).encode(), (resolve_host(host), port))
-            except OSError:
-                continue
+        peers = self.node.gossip_view()
+        # Draw one spare so that dropping the sender still leaves up to 5 targets.
+        targets = [p for p in random.sample(peers, min(6, len(peers))) if p != exclude][:5]
+        payload = wire.encode(msg)
+        # View addresses were already resolved by add_peer.
+        send_batch(self.node.udp_socket, [(payload, (host, port)) for host, port in targets])
 
     def handle_gossip(self, msg: dict, addr: Tuple[str, int]):
         gid = msg.get("id", "")
@@ -61,16 +71,10 @@ class GossipEngine:
             self.send_gossip_reply(addr[0], addr[1], peer_name)
 
     def send_gossip_reply(self, host: str, port: int, name: Optional[str]):
-        reply = {
-            "command": "GOSSIP_REPLY",
-            "host": self.node.peer_host,
-            "port": self.node.peer_port,
-            "name": self.node.peer_name,
-            "cliPort": self.node.cli_port,
-            "id": str(uuid.uuid4()),
-        }
+        payload = self._reply_prefix + new_message_id().encode() + self._reply_suffix
         try:
-            self.node.udp_socket.sendto(json.dumps(reply).encode(), (resolve_host(host), port))
+            # Replies go to a datagram's source address, which is already numeric.
+            self.node.udp_socket.sendto(payload, (host, port))
         except OSError:
             pass
 
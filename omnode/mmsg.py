@@ -0,0 +1,180 @@
+"""Batched UDP I/O using Linux sendmmsg(2)/recvmmsg(2), with portable fallbacks."""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+# Kernel limit on the number of messages accepted by a single sendmmsg call.
+UIO_MAXIOV = 1024
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IoVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_libc_function(name: str, argtypes: list):
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        func = getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = argtypes
+    func.restype = ctypes.c_int
+    return func
+
+
+_sendmmsg = _load_libc_function("sendmmsg", [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int])
+_recvmmsg = _load_libc_function(
+    "recvmmsg", [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+)
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+_SOCKADDR_IN_LEN = 16
+
+
+def _sockaddr_in(host: str, port: int) -> bytes:
+    """Pack a struct sockaddr_in; raises for anything that is not an IPv4 literal."""
+    return struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_pton(socket.AF_INET, host) + bytes(8)
+
+
+def _send_each(sock: socket.socket, messages: List[Tuple[bytes, Tuple[str, int]]]):
+    for payload, addr in messages:
+        try:
+            sock.sendto(payload, addr)
+        except (OSError, OverflowError):
+            continue
+
+
+def send_batch(sock: socket.socket, messages: List[Tuple[bytes, Tuple[str, int]]]):
+    """Send each (payload, (ip, port)) datagram, batching syscalls where possible.
+
+    Failed datagrams are skipped, matching the per-peer ``sendto`` loops this replaces.
+    """
+    if _sendmmsg is None or len(messages) < 2:
+        _send_each(sock, messages)
+        return
+    batch = []
+    fallback = []
+    for payload, addr in messages:
+        try:
+            batch.append((payload, _sockaddr_in(addr[0], addr[1])))
+        except (OSError, struct.error):
+            fallback.append((payload, addr))
+    count = len(batch)
+    if count:
+        hdrs = (_MMsgHdr * count)()
+        iovs = (_IoVec * count)()
+        names = []
+        for i, (payload, name) in enumerate(batch):
+            name_buf = ctypes.create_string_buffer(name, len(name))
+            names.append(name_buf)
+            iovs[i].iov_base = ctypes.cast(ctypes.c_char_p(payload), ctypes.c_void_p)
+            iovs[i].iov_len = len(payload)
+            hdr = hdrs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(name_buf)
+            hdr.msg_namelen = len(name)
+            hdr.msg_iov = ctypes.pointer(iovs[i])
+            hdr.msg_iovlen = 1
+        fd = sock.fileno()
+        base = ctypes.addressof(hdrs)
+        size = ctypes.sizeof(_MMsgHdr)
+        sent = 0
+        while sent < count:
+            n = _sendmmsg(fd, base + sent * size, min(count - sent, UIO_MAXIOV), 0)
+            # On error the kernel reports only the first datagram; skip it and carry on.
+            sent += n if n > 0 else 1
+    _send_each(sock, fallback)
+
+
+class DatagramReceiver:
+    """Dequeue pending datagrams from a UDP socket in batches without blocking.
+
+    On Linux one ``recvmmsg`` call fills up to ``batch`` preallocated buffers of
+    ``bufsize`` bytes; elsewhere the same batch is drained with ``recvfrom_into`` on a
+    single reusable buffer. Either way each datagram is copied out at its exact size.
+    Reads pass ``MSG_DONTWAIT`` so the socket itself can stay blocking for sends.
+    """
+
+    def __init__(self, sock: socket.socket, batch: int = 32, bufsize: int = 4096):
+        self.sock = sock
+        self.batch = batch
+        self.bufsize = bufsize
+        self._hdrs: Optional[ctypes.Array] = None
+        if _recvmmsg is not None:
+            self._pool = ctypes.create_string_buffer(batch * bufsize)
+            self._names = ctypes.create_string_buffer(batch * _SOCKADDR_IN_LEN)
+            self._iovs = (_IoVec * batch)()
+            self._hdrs = (_MMsgHdr * batch)()
+            pool = ctypes.addressof(self._pool)
+            names = ctypes.addressof(self._names)
+            for i in range(batch):
+                self._iovs[i].iov_base = pool + i * bufsize
+                self._iovs[i].iov_len = bufsize
+                hdr = self._hdrs[i].msg_hdr
+                hdr.msg_name = names + i * _SOCKADDR_IN_LEN
+                hdr.msg_iov = ctypes.pointer(self._iovs[i])
+                hdr.msg_iovlen = 1
+        else:
+            self._buf = bytearray(bufsize)
+            self._view = memoryview(self._buf)
+
+    def receive(self) -> List[Tuple[bytes, Tuple[str, int]]]:
+        """Return up to ``batch`` queued (data, addr) pairs; empty when none are waiting."""
+        if self._hdrs is None:
+            return self._receive_each()
+        for i in range(self.batch):
+            self._hdrs[i].msg_hdr.msg_namelen = _SOCKADDR_IN_LEN
+        n = _recvmmsg(self.sock.fileno(), ctypes.addressof(self._hdrs), self.batch, _MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        pool = ctypes.addressof(self._pool)
+        names = self._names.raw
+        packets = []
+        for i in range(n):
+            data = ctypes.string_at(pool + i * self.bufsize, self._hdrs[i].msg_len)
+            name = names[i * _SOCKADDR_IN_LEN : (i + 1) * _SOCKADDR_IN_LEN]
+            addr = (socket.inet_ntoa(name[4:8]), struct.unpack("!H", name[2:4])[0])
+            packets.append((data, addr))
+        return packets
+
+    def _receive_each(self) -> List[Tuple[bytes, Tuple[str, int]]]:
+        packets = []
+        for _ in range(self.batch):
+            if not _MSG_DONTWAIT and not select.select([self.sock], [], [], 0)[0]:
+                # No per-call non-blocking flag on this platform; poll before each read.
+                break
+            try:
+                nbytes, addr = self.sock.recvfrom_into(self._buf, self.bufsize, _MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            except OSError:
+                if packets:
+                    break
+                raise
+            packets.append((self._view[:nbytes].tobytes(), addr))
+        return packets
@@ -1,30 +1,51 @@
-import json
 import logging
 import random
-import select
+import selectors
 import socket
 import time
 import traceback
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict
 
-from .cli import CliHandler
+from . import wire
+from .cli import CliConn, CliHandler
 from .config import WELL_KNOWN_PEERS
 from .consensus import ConsensusEngine
 from .gossip import GossipEngine
+from .mmsg import DatagramReceiver
 from .utils import peer_key, resolve_host
 
+CLEANUP_INTERVAL = 5.0
+HEARTBEAT_INTERVAL = 60.0
+# Gossip is forwarded to peers drawn from this many most recently heard peers.
+GOSSIP_VIEW_SIZE = 20
+UDP_BATCHES_PER_WAKEUP = 16
+# Room for gossip and consensus bursts; the kernel default is ~208 KiB on Linux.
+UDP_SOCKET_BUFFER_BYTES = 4 << 20
+
+
+class PeerInfo(TypedDict):
+    host: str
+    port: int
+    name: str
+    last_seen: float
+
 
 class PeerNode:
     def __init__(self, peer_port: Optional[int] = None):
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.udp_socket.bind(("", peer_port if peer_port is not None else 0))
+        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_SOCKET_BUFFER_BYTES)
+        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SOCKET_BUFFER_BYTES)
+        self._udp_receiver = DatagramReceiver(self.udp_socket)
         _, self.peer_port = self.udp_socket.getsockname()
         try:
             self.peer_host = socket.gethostbyname(socket.gethostname())
         except socket.gaierror:
             self.peer_host = "127.0.0.1"
         self.peer_name = "Nakamichi Dragon"
+        self.self_addr: Tuple[str, int] = (self.peer_host, self.peer_port)
 
         self.cli_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.cli_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -32,121 +53,188 @@ class PeerNode:
         self.cli_socket.listen(5)
         self.cli_port = self.cli_socket.getsockname()[1]
 
-        self.peers: Dict[str, dict] = {}
-        self.gossip_cache: Dict[str, float] = {}
+        self.peers: Dict[str, PeerInfo] = {}
+        # Resolved (ip, port) of every entry in self.peers, kept in step with it.
+        self._peer_addrs: List[Tuple[str, int]] = []
+        # Newscast-style view: the GOSSIP_VIEW_SIZE most recently heard peers, freshest last.
+        self._view: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        # Insertion-ordered so the oldest entries can be expired from the front.
+        self.gossip_cache: "OrderedDict[str, float]" = OrderedDict()
 
         self.word_list: List[str] = ["" for _ in range(5)]
         self.lie_mode: bool = False
         self.lie_rate: float = 1.0
 
-        self.cli_clients: List[socket.socket] = []
-        self.cli_buffers: Dict[socket.socket, str] = {}
+        self.cli_clients: Dict[int, CliConn] = {}
 
-        self.last_heartbeat = 0.0
-        self.last_cleanup = 0.0
+        # Monotonic timestamps; -inf makes the first loop iteration run both tasks.
+        self.last_heartbeat = float("-inf")
+        self.last_cleanup = float("-inf")
+
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self.udp_socket, selectors.EVENT_READ, "udp")
+        self._sel.register(self.cli_socket, selectors.EVENT_READ, "listen")
 
         self.consensus = ConsensusEngine(self)
         self.gossip = GossipEngine(self)
         self.cli_handler = CliHandler(self)
+        self._udp_dispatch: Dict[str, Callable[[dict, Tuple[str, int]], None]] = {
+            "GOSSIP": self.gossip.handle_gossip,
+            "GOSSIP_REPLY": self._handle_gossip_reply,
+            "CONSENSUS": self.consensus.handle_consensus,
+        }
 
     # Peer helpers ---------------------------------------------------
-    def add_peer(self, host: str, port: int, name: Optional[str] = None):
+    def add_peer(self, host: str, port: int, name: Optional[str] = None) -> str:
         resolved_host = resolve_host(host)
         key = peer_key(resolved_host, port)
-        if key not in self.peers:
-            self.peers[key] = {"host": resolved_host, "port": port, "name": name or key, "last_seen": time.time()}
+        if (resolved_host, port) == self.self_addr:
+            # Our own gossip echoed back; keep this node out of its peer table so
+            # heartbeats and forwards never target it.
+            return key
+        info = self.peers.get(key)
+        if info is None:
+            self.peers[key] = {"host": resolved_host, "port": port, "name": name or key, "last_seen": time.monotonic()}
+            self._peer_addrs.append((resolved_host, port))
             logging.info("Added peer %s", key)
         else:
-            self.peers[key]["last_seen"] = time.time()
+            info["last_seen"] = time.monotonic()
             if name:
-                self.peers[key]["name"] = name
+                info["name"] = name
+        view = self._view
+        if key in view:
+            view.move_to_end(key)
+        else:
+            view[key] = (resolved_host, port)
+            if len(view) > GOSSIP_VIEW_SIZE:
+                view.popitem(last=False)
         return key
 
     def known_peers(self) -> List[Tuple[str, int]]:
-        return [(info["host"], info["port"]) for info in self.peers.values()]
+        """Return the resolved peer addresses; the list is shared, so do not mutate it."""
+        return self._peer_addrs
+
+    def gossip_view(self) -> List[Tuple[str, int]]:
+        """Return the addresses of the most recently heard peers, at most GOSSIP_VIEW_SIZE."""
+        return list(self._view.values())
+
+    def close_cli_client(self, sock: socket.socket):
+        if self.cli_clients.pop(sock.fileno(), None) is not None:
+            self._sel.unregister(sock)
+        sock.close()
 
     # Loop utilities -------------------------------------------------
     def announce_to_well_known(self):
-        self.gossip.send_gossip(WELL_KNOWN_PEERS)
+        self.gossip.send_gossip([(resolve_host(host), port) for host, port in WELL_KNOWN_PEERS])
 
     def cleanup_peers(self):
-        now = time.time()
+        now = time.monotonic()
         stale = [k for k, v in self.peers.items() if now - v.get("last_seen", 0) > 120]
+        if not stale:
+            return
         for key in stale:
             logging.info("Removing stale peer %s", key)
             self.peers.pop(key, None)
+        self._peer_addrs = [(info["host"], info["port"]) for info in self.peers.values()]
+        freshest = sorted(self.peers.items(), key=lambda item: item[1]["last_seen"])[-GOSSIP_VIEW_SIZE:]
+        self._view = OrderedDict((key, (info["host"], info["port"])) for key, info in freshest)
 
     def heartbeat(self):
         peers = self.known_peers()
-        random_peers = list(peers)
-        random.shuffle(random_peers)
-        self.gossip.send_gossip(random_peers[:5])
+        self.gossip.send_gossip(random.sample(peers, min(5, len(peers))))
 
     # Main loop ------------------------------------------------------
     def run(self):
         logging.info("Peer listening on UDP %s:%d", self.peer_host, self.peer_port)
         logging.info("CLI listening on TCP port %d", self.cli_port)
+        # The kernel may clamp (net.core.rmem_max/wmem_max) or double the requested sizes.
+        logging.info(
+            "UDP socket buffers: recv=%d send=%d bytes",
+            self.udp_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+            self.udp_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+        )
         self.announce_to_well_known()
         while True:
-            now = time.time()
-            timeout = 1.0
-            if now - self.last_cleanup > 5:
+            now = time.monotonic()
+            if now - self.last_cleanup >= CLEANUP_INTERVAL:
                 self.cleanup_peers()
                 self.last_cleanup = now
-            if now - self.last_heartbeat > 60:
+            if now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
                 self.heartbeat()
                 self.last_heartbeat = now
-            sockets = [self.udp_socket, self.cli_socket] + self.cli_clients
-            readable, _, _ = select.select(sockets, [], [], timeout)
-            for sock in readable:
-                if sock is self.udp_socket:
+            if self.consensus.pending_reports:
+                timeout = 0.0
+            else:
+                # Sleep until the next periodic task is due rather than polling.
+                deadline = min(self.last_cleanup + CLEANUP_INTERVAL, self.last_heartbeat + HEARTBEAT_INTERVAL)
+                timeout = max(0.0, deadline - time.monotonic())
+            for key, _ in self._sel.select(timeout):
+                if key.data == "udp":
                     self._handle_udp()
-                elif sock is self.cli_socket:
+                elif key.data == "listen":
                     self._accept_cli_client()
                 else:
-                    self._handle_cli_socket(sock)
+                    self._handle_cli_socket(key.data)
+            self.consensus.process_pending_reports()
 
     # Internal handlers ---------------------------------------------
     def _handle_udp(self):
+        # Drain what is queued, but cap the work per wakeup so CLI clients are not starved.
+        for _ in range(UDP_BATCHES_PER_WAKEUP):
+            try:
+                packets = self._udp_receiver.receive()
+            except OSError:
+                traceback.print_exc()
+                return
+            if not packets:
+                return
+            for data, addr in packets:
+                self._handle_datagram(data, addr)
+
+    def _handle_datagram(self, data: bytes, addr: Tuple[str, int]):
         try:
-            data, addr = self.udp_socket.recvfrom(4096)
-            msg = json.loads(data.decode())
-            command = msg.get("command")
-            if command == "GOSSIP":
-                self.gossip.handle_gossip(msg, addr)
-            elif command == "GOSSIP_REPLY":
-                self.add_peer(addr[0], addr[1], name=msg.get("name"))
-            elif command == "CONSENSUS":
-                self.consensus.handle_consensus(msg, addr)
+            msg = wire.decode(data)
+            handler = self._udp_dispatch.get(msg.get("command"))
+            if handler is not None:
+                handler(msg, addr)
         except Exception:
             traceback.print_exc()
 
+    def _handle_gossip_reply(self, msg: dict, addr: Tuple[str, int]):
+        self.add_peer(addr[0], addr[1], name=msg.get("name"))
+
     def _accept_cli_client(self):
-        client, _ = self.cli_socket.accept()
+        client, addr = self.cli_socket.accept()
         client.setblocking(False)
-        self.cli_clients.append(client)
-        self.cli_buffers[client] = ""
+        conn = CliConn(client, addr)
+        self.cli_clients[client.fileno()] = conn
+        self._sel.register(client, selectors.EVENT_READ, conn)
         client.sendall(
             b"Welcome to the OM node CLI. Commands: peers, current, consensus <idx> <word>, lie [pct], truth, exit\n"
         )
 
-    def _handle_cli_socket(self, sock: socket.socket):
+    def _handle_cli_socket(self, conn: CliConn):
+        sock = conn.sock
         try:
             chunk = sock.recv(4096)
             if not chunk:
-                sock.close()
-                if sock in self.cli_clients:
-                    self.cli_clients.remove(sock)
-                self.cli_buffers.pop(sock, None)
+                self.close_cli_client(sock)
                 return
-            buffer = self.cli_buffers.get(sock, "") + chunk.decode()
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
+            buffer = conn.buffer
+            # What was buffered before holds no newline, so scanning starts at the new chunk.
+            end = len(buffer)
+            buffer += chunk
+            end = buffer.find(b"\n", end)
+            start = 0
+            while end >= 0:
+                line = buffer[start:end].decode()
+                start = end + 1
                 self.cli_handler.handle_cli_message(sock, line)
-            self.cli_buffers[sock] = buffer
+                if sock.fileno() < 0:
+                    return
+                end = buffer.find(b"\n", start)
+            # Drop every consumed line with a single shift of the remaining bytes.
+            del buffer[:start]
         except Exception:
             traceback.print_exc()
-            sock.close()
-            if sock in self.cli_clients:
-                self.cli_clients.remove(sock)
-            self.cli_buffers.pop(sock, None)
+            self.close_cli_client(sock)
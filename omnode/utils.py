@@ -1,13 +1,60 @@
+import functools
+import os
 import socket
+import sys
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DNS_CACHE_TTL = 300.0
+# Failed lookups are retried soon; a transient resolver error should not pin a peer.
+DNS_FAILURE_TTL = 5.0
+# Hostnames arrive in peer-controlled GOSSIP fields, so the cache must stay bounded.
+DNS_CACHE_MAX = 1024
+
+_dns_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
 
 
 def resolve_host(host: str) -> str:
-    """Resolve hostnames gracefully, returning the original host on failure."""
+    """Resolve hostnames gracefully, returning the original host on failure.
+
+    Results are cached for ``DNS_CACHE_TTL`` seconds (``DNS_FAILURE_TTL`` for failed
+    lookups) so send loops do not block on repeated ``gethostbyname`` lookups.
+    """
+    now = time.monotonic()
+    cached = _dns_cache.get(host)
+    if cached is not None and now < cached[0]:
+        return cached[1]
     try:
-        return socket.gethostbyname(host)
+        resolved = socket.gethostbyname(host)
+        expires = now + DNS_CACHE_TTL
     except socket.gaierror:
-        return host
+        resolved = host
+        expires = now + DNS_FAILURE_TTL
+    _dns_cache[host] = (expires, resolved)
+    _dns_cache.move_to_end(host)
+    if len(_dns_cache) > DNS_CACHE_MAX:
+        _dns_cache.popitem(last=False)
+    return resolved
 
 
+@functools.lru_cache(maxsize=4096)
 def peer_key(host: str, port: int) -> str:
-    return f"{host}:{port}"
+    """Return the interned ``host:port`` key used for peer and report lookups."""
+    return sys.intern(f"{host}:{port}")
+
+
+def parse_peer_key(key: str) -> Optional[Tuple[str, int]]:
+    """Split a ``host:port`` key back into its parts, or return None if malformed."""
+    host, sep, port = key.rpartition(":")
+    if not sep:
+        return None
+    try:
+        return host, int(port)
+    except ValueError:
+        return None
+
+
+def new_message_id() -> str:
+    """Return a fresh 16-character random id for gossip and consensus messages."""
+    return os.urandom(8).hex()
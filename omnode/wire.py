@@ -0,0 +1,17 @@
+"""Encoding and decoding of peer protocol messages.
+
+The protocol in ``a3.html`` requires text-encoded JSON with fixed field names, so
+other peers can only read JSON. Messages are written without the default
+whitespace after separators and decoded directly from the received bytes.
+"""
+import json
+
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode(msg: dict) -> bytes:
+    return _encoder.encode(msg).encode()
+
+
+def decode(data: bytes) -> dict:
+    return json.loads(data)